@@ -3,9 +3,12 @@ Admin routes for user management.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import exists, func
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
+import os
+import time
 
 from app.database import get_db
 from app.models import UserModel
@@ -14,6 +17,15 @@ from app.schemas import UserResponse
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
+# Platform stats only feed the admin dashboard, so a short-lived cached copy is fine
+STATS_CACHE_TTL_SECONDS = int(os.getenv("STATS_CACHE_TTL_SECONDS", "60"))
+_stats_cache = {"value": None, "expires_at": 0.0}
+
+
+def invalidate_stats_cache():
+    """Drop the cached stats after a change to the user counts (signup or admin edit)."""
+    _stats_cache["expires_at"] = 0.0
+
 
 class UserUpdateRequest(BaseModel):
     email: Optional[str] = None
@@ -24,33 +36,31 @@ class UserUpdateRequest(BaseModel):
 
 
 @router.get("/users", response_model=List[UserResponse])
-async def list_users(
+def list_users(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
     admin_user: UserModel = Depends(get_current_admin_user)
 ):
     """List all users (admin only)."""
-    users = db.query(UserModel).offset(skip).limit(limit).all()
-    return [
-        UserResponse(
-            id=str(u.id),
-            email=u.email,
-            email_verified=u.email_verified,
-            first_name=u.first_name,
-            last_name=u.last_name,
-            role=u.role,
-            subscription_tier=u.subscription_tier,
-            subscription_expires_at=u.subscription_expires_at,
-            is_primary_account=u.is_primary_account,
-            created_at=u.created_at
-        )
-        for u in users
-    ]
+    # Select only the response columns - plain rows, no ORM instance hydration
+    users = db.query(
+        UserModel.id,
+        UserModel.email,
+        UserModel.email_verified,
+        UserModel.first_name,
+        UserModel.last_name,
+        UserModel.role,
+        UserModel.subscription_tier,
+        UserModel.subscription_expires_at,
+        UserModel.is_primary_account,
+        UserModel.created_at
+    ).offset(skip).limit(limit).all()
+    return [UserResponse.from_user(u) for u in users]
 
 
 @router.get("/users/{user_id}", response_model=UserResponse)
-async def get_user(
+def get_user(
     user_id: str,
     db: Session = Depends(get_db),
     admin_user: UserModel = Depends(get_current_admin_user)
@@ -60,22 +70,11 @@ async def get_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return UserResponse(
-        id=str(user.id),
-        email=user.email,
-        email_verified=user.email_verified,
-        first_name=user.first_name,
-        last_name=user.last_name,
-        role=user.role,
-        subscription_tier=user.subscription_tier,
-        subscription_expires_at=user.subscription_expires_at,
-        is_primary_account=user.is_primary_account,
-        created_at=user.created_at
-    )
+    return UserResponse.from_user(user)
 
 
 @router.put("/users/{user_id}", response_model=UserResponse)
-async def update_user(
+def update_user(
     user_id: str,
     user_data: UserUpdateRequest,
     db: Session = Depends(get_db),
@@ -103,11 +102,13 @@ async def update_user(
     # Update fields
     if user_data.email is not None:
         # Check if email is already taken by another user
-        existing = db.query(UserModel).filter(
-            UserModel.email == user_data.email.lower(),
-            UserModel.id != user_id
-        ).first()
-        if existing:
+        email_taken = db.query(
+            exists().where(
+                UserModel.email == user_data.email.lower(),
+                UserModel.id != user_id
+            )
+        ).scalar()
+        if email_taken:
             raise HTTPException(status_code=400, detail="Email already in use")
         user.email = user_data.email.lower()
     
@@ -120,25 +121,16 @@ async def update_user(
     if user_data.subscription_tier is not None:
         user.subscription_tier = user_data.subscription_tier
     
+    # Every response field is already loaded; build it before commit expires the row
+    response = UserResponse.from_user(user)
     db.commit()
-    db.refresh(user)
+    invalidate_stats_cache()
     
-    return UserResponse(
-        id=str(user.id),
-        email=user.email,
-        email_verified=user.email_verified,
-        first_name=user.first_name,
-        last_name=user.last_name,
-        role=user.role,
-        subscription_tier=user.subscription_tier,
-        subscription_expires_at=user.subscription_expires_at,
-        is_primary_account=user.is_primary_account,
-        created_at=user.created_at
-    )
+    return response
 
 
 @router.delete("/users/{user_id}")
-async def delete_user(
+def delete_user(
     user_id: str,
     db: Session = Depends(get_db),
     admin_user: UserModel = Depends(get_current_admin_user)
@@ -157,25 +149,37 @@ async def delete_user(
     
     db.delete(user)
     db.commit()
+    invalidate_stats_cache()
     
     return {"message": "User deleted successfully"}
 
 
 @router.get("/stats")
-async def get_stats(
+def get_stats(
     db: Session = Depends(get_db),
     admin_user: UserModel = Depends(get_current_admin_user)
 ):
-    """Get platform statistics (admin only)."""
-    total_users = db.query(UserModel).count()
-    freemium_users = db.query(UserModel).filter(UserModel.role == 'freemium').count()
-    paid_users = db.query(UserModel).filter(UserModel.role == 'paid').count()
-    admin_users = db.query(UserModel).filter(UserModel.role == 'admin').count()
+    """Get platform statistics (admin only).
+
+    Cached for STATS_CACHE_TTL_SECONDS per worker process. Registration and admin
+    edits clear the cache of the process that handled them; other workers may show
+    counts up to that many seconds old.
+    """
+    if _stats_cache["value"] is not None and time.monotonic() < _stats_cache["expires_at"]:
+        return _stats_cache["value"]
+    
+    # Count all roles in one grouped query instead of one COUNT per role
+    role_counts = dict(
+        db.query(UserModel.role, func.count(UserModel.id)).group_by(UserModel.role).all()
+    )
     
-    return {
-        "total_users": total_users,
-        "freemium_users": freemium_users,
-        "paid_users": paid_users,
-        "admin_users": admin_users
+    stats = {
+        "total_users": sum(role_counts.values()),
+        "freemium_users": role_counts.get('freemium', 0),
+        "paid_users": role_counts.get('paid', 0),
+        "admin_users": role_counts.get('admin', 0)
     }
+    _stats_cache["value"] = stats
+    _stats_cache["expires_at"] = time.monotonic() + STATS_CACHE_TTL_SECONDS
+    return stats
 
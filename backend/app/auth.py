@@ -3,15 +3,18 @@ Authentication utilities: password hashing, JWT tokens, and auth dependencies.
 """
 
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import bindparam, lambda_stmt, select
 from sqlalchemy.orm import Session
 import os
 import secrets
 import bcrypt
 import hashlib
+import time
 
 from app.database import get_db
 from app.models import UserModel, UserSessionModel
@@ -22,9 +25,16 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
+# Number of verified tokens kept in the per-process decode cache
+TOKEN_CACHE_SIZE = 1024
+
 # Security scheme
 security = HTTPBearer()
 
+# User lookup run on every authenticated request; built once so SQLAlchemy
+# reuses the cached compiled form instead of rebuilding the statement
+_USER_BY_ID = lambda_stmt(lambda: select(UserModel).where(UserModel.id == bindparam("user_id")))
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
@@ -61,39 +71,59 @@ def create_refresh_token(data: dict) -> str:
     return encoded_jwt
 
 
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def _decode_token(token: str) -> dict:
+    """Decode and verify a JWT signature, caching the result per token.
+    
+    A client reuses the same access token for every request until it expires,
+    so the signature check and JSON decode only run once per token. Expiry is
+    re-checked by the caller on every use.
+    """
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
 def verify_token(token: str, token_type: str = "access") -> dict:
     """Verify and decode a JWT token."""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        if payload.get("type") != token_type:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token type"
-            )
-        return payload
+        payload = _decode_token(token)
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
+    
+    exp = payload.get("exp")
+    if exp is not None and exp < time.time():
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials"
+        )
+    if payload.get("type") != token_type:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token type"
+        )
+    return payload
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> UserModel:
-    """Dependency to get the current authenticated user."""
-    token = credentials.credentials
+def _get_user_from_token(token: str, db: Session) -> Optional[UserModel]:
+    """Resolve an access token to its user, or None if the user no longer exists."""
     payload = verify_token(token, "access")
     user_id: str = payload.get("sub")
-    
     if user_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
-    
-    user = db.query(UserModel).filter(UserModel.id == user_id).first()
+    return db.execute(_USER_BY_ID, {"user_id": user_id}).scalar_one_or_none()
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> UserModel:
+    """Dependency to get the current authenticated user."""
+    user = _get_user_from_token(credentials.credentials, db)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -112,15 +142,7 @@ def get_current_user_optional(
         return None
     
     try:
-        token = credentials.credentials
-        payload = verify_token(token, "access")
-        user_id: str = payload.get("sub")
-        
-        if user_id is None:
-            return None
-        
-        user = db.query(UserModel).filter(UserModel.id == user_id).first()
-        return user
+        return _get_user_from_token(credentials.credentials, db)
     except HTTPException:
         return None
 
@@ -142,13 +164,3 @@ def hash_refresh_token(token: str) -> str:
     # JWT tokens can be longer than 72 bytes, so use SHA256 instead
     return hashlib.sha256(token.encode('utf-8')).hexdigest()
 
-
-def verify_refresh_token_hash(token: str, hashed_token: str) -> bool:
-    """Verify a refresh token against its hash."""
-    try:
-        # Compare SHA256 hash
-        token_hash = hashlib.sha256(token.encode('utf-8')).hexdigest()
-        return token_hash == hashed_token
-    except Exception:
-        return False
-
@@ -3,7 +3,7 @@ Authentication routes: register, login, logout, refresh, me.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, Body
-from fastapi.security import HTTPBearer
+from sqlalchemy import exists
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone, timedelta
 from typing import Optional
@@ -12,6 +12,7 @@ from pydantic import BaseModel
 from app.database import get_db
 from app.models import UserModel, UserSessionModel
 from app.schemas import UserRegister, UserLogin, TokenResponse, UserResponse
+from app.admin_routes import invalidate_stats_cache
 from app.auth import (
     verify_password,
     get_password_hash,
@@ -20,13 +21,11 @@ from app.auth import (
     verify_token,
     get_current_user,
     hash_refresh_token,
-    verify_refresh_token_hash,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     REFRESH_TOKEN_EXPIRE_DAYS
 )
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
-security = HTTPBearer()
 
 
 class RefreshTokenRequest(BaseModel):
@@ -34,14 +33,16 @@ class RefreshTokenRequest(BaseModel):
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(
+def register(
     user_data: UserRegister,
     db: Session = Depends(get_db)
 ):
     """Register a new user."""
     # Check if email already exists
-    existing_user = db.query(UserModel).filter(UserModel.email == user_data.email.lower()).first()
-    if existing_user:
+    email_taken = db.query(
+        exists().where(UserModel.email == user_data.email.lower())
+    ).scalar()
+    if email_taken:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
@@ -58,25 +59,18 @@ async def register(
     )
     
     db.add(user)
+    # Flushing returns the server defaults (eager_defaults), so the response can be
+    # built here instead of re-selecting the expired row after commit
+    db.flush()
+    response = UserResponse.from_user(user)
     db.commit()
-    db.refresh(user)
+    invalidate_stats_cache()
     
-    return UserResponse(
-        id=str(user.id),
-        email=user.email,
-        email_verified=user.email_verified,
-        first_name=user.first_name,
-        last_name=user.last_name,
-        role=user.role,
-        subscription_tier=user.subscription_tier,
-        subscription_expires_at=user.subscription_expires_at,
-        is_primary_account=user.is_primary_account,
-        created_at=user.created_at
-    )
+    return response
 
 
 @router.post("/login", response_model=TokenResponse)
-async def login(
+def login(
     credentials: UserLogin,
     db: Session = Depends(get_db)
 ):
@@ -89,9 +83,10 @@ async def login(
             detail="Incorrect email or password"
         )
     
-    # Update last login
-    user.last_login_at = datetime.now(timezone.utc)
-    db.commit()
+    now = datetime.now(timezone.utc)
+    
+    # Update last login (committed together with the new session below)
+    user.last_login_at = now
     
     # Create tokens
     access_token = create_access_token(data={"sub": str(user.id)})
@@ -99,7 +94,7 @@ async def login(
     
     # Store refresh token in database
     refresh_token_hash = hash_refresh_token(refresh_token)
-    expires_at = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    expires_at = now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     
     session = UserSessionModel(
         user_id=user.id,
@@ -116,7 +111,7 @@ async def login(
 
 
 @router.post("/refresh", response_model=TokenResponse)
-async def refresh_token(
+def refresh_token(
     request: RefreshTokenRequest,
     db: Session = Depends(get_db)
 ):
@@ -142,17 +137,15 @@ async def refresh_token(
                 detail="User not found"
             )
         
-        # Find and verify session
-        sessions = db.query(UserSessionModel).filter(
-            UserSessionModel.user_id == user.id,
-            UserSessionModel.expires_at > datetime.now(timezone.utc)
-        ).all()
-        
-        session_found = False
-        for session in sessions:
-            if verify_refresh_token_hash(refresh_token, session.refresh_token_hash):
-                session_found = True
-                break
+        # Find and verify session - match the token hash in SQL (indexed)
+        # rather than loading every active session and comparing in Python
+        session_found = db.query(
+            exists().where(
+                UserSessionModel.user_id == user.id,
+                UserSessionModel.refresh_token_hash == hash_refresh_token(refresh_token),
+                UserSessionModel.expires_at > datetime.now(timezone.utc)
+            )
+        ).scalar()
         
         if not session_found:
             raise HTTPException(
@@ -178,7 +171,7 @@ async def refresh_token(
 
 
 @router.post("/logout")
-async def logout(
+def logout(
     current_user: UserModel = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -195,15 +188,4 @@ async def get_current_user_info(
     current_user: UserModel = Depends(get_current_user)
 ):
     """Get current user information."""
-    return UserResponse(
-        id=str(current_user.id),
-        email=current_user.email,
-        email_verified=current_user.email_verified,
-        first_name=current_user.first_name,
-        last_name=current_user.last_name,
-        role=current_user.role,
-        subscription_tier=current_user.subscription_tier,
-        subscription_expires_at=current_user.subscription_expires_at,
-        is_primary_account=current_user.is_primary_account,
-        created_at=current_user.created_at
-    )
+    return UserResponse.from_user(current_user)
@@ -5,6 +5,7 @@ Database configuration and session management.
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import orjson
 import os
 
 # Require DATABASE_URL to be set - no local fallback
@@ -12,12 +13,23 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable must be set")
 
+# Connection pool sizing - override per deployment (e.g. smaller when behind PgBouncer)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
 # Create engine with connection pooling for PostgreSQL
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,  # Verify connections before using them
-    pool_size=5,  # Number of connections to maintain
-    max_overflow=10  # Additional connections that can be created on demand
+    pool_size=DB_POOL_SIZE,  # Number of connections to maintain
+    max_overflow=DB_MAX_OVERFLOW,  # Additional connections that can be created on demand
+    pool_recycle=DB_POOL_RECYCLE,  # Replace connections older than this many seconds
+    executemany_mode="values_plus_batch",  # Batch multi-row INSERTs and UPDATEs into few round-trips
+    # Encode/decode JSONB with orjson instead of stdlib json; psycopg2 wants str
+    # parameters, hence the decode (the loads side is registered on each connection)
+    json_serializer=lambda obj: orjson.dumps(obj).decode(),
+    json_deserializer=orjson.loads
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -38,11 +50,15 @@ def init_db():
     """Initialize database tables using SQLAlchemy models.
     
     All tables are defined in models.py and will be created automatically.
-    For schema changes, use proper database migrations (e.g., Alembic).
+    Existing tables are brought up to date by schema_upgrade.upgrade_schema.
     """
     from app import models  # noqa: F401 - Import models to register them with Base
-    # Create all tables - SQLAlchemy will handle table creation
-    # This is idempotent - existing tables won't be recreated
-    Base.metadata.create_all(bind=engine)
+    from app.schema_upgrade import upgrade_schema
+    with engine.begin() as connection:
+        # Create all tables - SQLAlchemy will handle table creation
+        # This is idempotent - existing tables won't be recreated
+        Base.metadata.create_all(bind=connection)
+        # Also idempotent - only applies changes the live schema is missing
+        upgrade_schema(connection)
     print("Database tables initialized successfully")
 
@@ -4,9 +4,11 @@ FastAPI backend for portfolio simulator.
 
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import and_, cast, func, insert, select, tuple_
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
 from typing import List
-from datetime import datetime, timezone
 import os
 
 from app.database import get_db, init_db
@@ -24,11 +26,14 @@ from app.schemas import (
 from app.auth import get_current_user_optional
 from app.auth_routes import router as auth_router
 from app.admin_routes import router as admin_router
+from app.rate_limit import limit_concurrent_saves
 
 app = FastAPI(
     title="Portfolio Simulator API",
     description="Backend API for portfolio comparison simulator",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson serializes the large portfolio/scenario payloads much faster than stdlib json
+    default_response_class=ORJSONResponse
 )
 
 # CORS configuration
@@ -66,8 +71,41 @@ async def health():
     return {"status": "ok", "message": "Portfolio Simulator API is running"}
 
 
-@app.post("/api/data/save", response_model=dict)
-async def save_data(
+# Advisory lock key serializing updates of the shared default scenario
+SCENARIO_DEFAULT_LOCK_ID = 7301
+
+
+def _upsert(db: Session, model, rows: List[dict], immutable=("id",), where=None):
+    """Insert rows or update them in place with one INSERT ... ON CONFLICT (id).
+
+    Columns in `immutable` are only written on insert. Conflicting rows whose values
+    are unchanged (or that fail `where`) are skipped, so a repeated save doesn't
+    rewrite them or bump updated_at. Returns the ids actually inserted or updated.
+    """
+    stmt = pg_insert(model).values(rows)
+    columns = [key for key in rows[0] if key not in immutable]
+
+    def comparable(column):
+        # Databases created before the JSONB switch still have json columns, and
+        # json has no equality operator; casting both sides works for either type
+        return cast(column, JSONB) if isinstance(column.type, JSONB) else column
+
+    changed = tuple_(*[comparable(model.__table__.c[key]) for key in columns]).is_distinct_from(
+        tuple_(*[comparable(stmt.excluded[key]) for key in columns])
+    )
+    update_columns = {key: stmt.excluded[key] for key in columns}
+    # ON CONFLICT bypasses the ORM onupdate hook, so set updated_at here (DB clock)
+    update_columns["updated_at"] = func.now()
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[model.__table__.c.id],
+        set_=update_columns,
+        where=and_(changed, where) if where is not None else changed
+    )
+    return set(db.execute(stmt.returning(model.__table__.c.id)).scalars())
+
+
+@app.post("/api/data/save", response_model=dict, dependencies=[Depends(limit_concurrent_saves)])
+def save_data(
     data: SaveDataRequest,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_user_optional)
@@ -76,106 +114,57 @@ async def save_data(
     try:
         user_id = current_user.id if current_user else None
         
-        # Save portfolios
-        for portfolio_data in data.portfolios:
-            # Filter by user_id if authenticated, or by id only if not
-            query = db.query(PortfolioModel).filter(PortfolioModel.id == portfolio_data.id)
-            if user_id:
-                query = query.filter(PortfolioModel.user_id == user_id)
-            portfolio = query.first()
-            
-            # Convert camelCase to snake_case for database
-            risk_label = getattr(portfolio_data, 'riskLabel', None) or getattr(portfolio_data, 'risk_label', None)
-            horizon = getattr(portfolio_data, 'horizon', None)
-            selected_strategy = getattr(portfolio_data, 'selectedStrategy', None) or getattr(portfolio_data, 'selected_strategy', None)
-            overperform_strategy = getattr(portfolio_data, 'overperformStrategy', None) or getattr(portfolio_data, 'overperform_strategy', None)
-            
-            if portfolio:
-                # Update existing
-                portfolio.name = portfolio_data.name
-                portfolio.color = portfolio_data.color
-                portfolio.capital = portfolio_data.capital
-                portfolio.goal = portfolio_data.goal
-                portfolio.risk_label = risk_label
-                portfolio.horizon = horizon
-                portfolio.selected_strategy = selected_strategy
-                portfolio.overperform_strategy = overperform_strategy
-                portfolio.allocation = portfolio_data.allocation
-                # member_allocations removed - we now use per-member portfolios instead
-                portfolio.rules = portfolio_data.rules
-                portfolio.strategy = portfolio_data.strategy
-                # Explicitly update the updated_at timestamp
-                portfolio.updated_at = datetime.now(timezone.utc)
-            else:
-                # Create new
-                portfolio = PortfolioModel(
-                    id=portfolio_data.id,
-                    user_id=user_id,
-                    name=portfolio_data.name,
-                    color=portfolio_data.color,
-                    capital=portfolio_data.capital,
-                    goal=portfolio_data.goal,
-                    risk_label=risk_label,
-                    horizon=horizon,
-                    selected_strategy=selected_strategy,
-                    overperform_strategy=overperform_strategy,
-                    allocation=portfolio_data.allocation,
+        # Save portfolios with a single INSERT ... ON CONFLICT instead of a
+        # SELECT + INSERT/UPDATE round-trip per portfolio
+        if data.portfolios:
+            portfolio_rows = []
+            for portfolio_data in data.portfolios:
+                # Convert camelCase to snake_case for database
+                risk_label = getattr(portfolio_data, 'riskLabel', None) or getattr(portfolio_data, 'risk_label', None)
+                horizon = getattr(portfolio_data, 'horizon', None)
+                selected_strategy = getattr(portfolio_data, 'selectedStrategy', None) or getattr(portfolio_data, 'selected_strategy', None)
+                overperform_strategy = getattr(portfolio_data, 'overperformStrategy', None) or getattr(portfolio_data, 'overperform_strategy', None)
+
+                portfolio_rows.append({
+                    "id": portfolio_data.id,
+                    "user_id": user_id,
+                    "name": portfolio_data.name,
+                    "color": portfolio_data.color,
+                    "capital": portfolio_data.capital,
+                    "goal": portfolio_data.goal,
+                    "risk_label": risk_label,
+                    "horizon": horizon,
+                    "selected_strategy": selected_strategy,
+                    "overperform_strategy": overperform_strategy,
+                    "allocation": portfolio_data.allocation,
                     # member_allocations removed - we now use per-member portfolios instead
-                    rules=portfolio_data.rules,
-                    strategy=portfolio_data.strategy
-                )
-                db.add(portfolio)
-        
-        # Save scenarios
-        # First, unset all defaults
-        db.query(ScenarioModel).update({ScenarioModel.is_default: False})
-        
-        for scenario_data in data.scenarios:
-            # Use name as ID for scenarios
-            scenario_id = scenario_data.name
-            scenario = db.query(ScenarioModel).filter(
-                ScenarioModel.id == scenario_id
-            ).first()
-            
-            # Convert camelCase to snake_case for database
-            asset_returns = scenario_data.assetReturns
-            trim_rules = scenario_data.trimRules
-            fidelis_cap = scenario_data.fidelisCap
-            growth_cushion = getattr(scenario_data, 'growthCushion', None) or getattr(scenario_data, 'growth_cushion', None) or 0.02
-            romanian_inflation = getattr(scenario_data, 'romanianInflation', None) or getattr(scenario_data, 'romanian_inflation', None) or 0.08
-            tax_on_sale_proceeds = getattr(scenario_data, 'taxOnSaleProceeds', None) or getattr(scenario_data, 'tax_on_sale_proceeds', None)
-            tax_on_dividends = getattr(scenario_data, 'taxOnDividends', None) or getattr(scenario_data, 'tax_on_dividends', None)
-            
-            if scenario:
-                # Update existing
-                scenario.name = scenario_data.name
-                scenario.inflation = scenario_data.inflation
-                scenario.romanian_inflation = romanian_inflation
-                scenario.growth_cushion = growth_cushion
-                scenario.tax_on_sale_proceeds = tax_on_sale_proceeds
-                scenario.tax_on_dividends = tax_on_dividends
-                scenario.asset_returns = asset_returns
-                scenario.trim_rules = trim_rules
-                scenario.fidelis_cap = fidelis_cap
-                scenario.is_default = (data.default_scenario_id == scenario_data.name)
-                # Explicitly update the updated_at timestamp
-                scenario.updated_at = datetime.now(timezone.utc)
-            else:
-                # Create new
-                scenario = ScenarioModel(
-                    id=scenario_id,
-                    name=scenario_data.name,
-                    inflation=scenario_data.inflation,
-                    romanian_inflation=romanian_inflation,
-                    growth_cushion=growth_cushion,
-                    tax_on_sale_proceeds=tax_on_sale_proceeds,
-                    tax_on_dividends=tax_on_dividends,
-                    asset_returns=asset_returns,
-                    trim_rules=trim_rules,
-                    fidelis_cap=fidelis_cap,
-                    is_default=(data.default_scenario_id == scenario_data.name)
-                )
-                db.add(scenario)
+                    "rules": portfolio_data.rules,
+                    "strategy": portfolio_data.strategy,
+                })
+
+            # user_id is only set on create; only overwrite rows owned by the authenticated user
+            written_ids = _upsert(
+                db,
+                PortfolioModel,
+                portfolio_rows,
+                immutable=("id", "user_id"),
+                where=(PortfolioModel.user_id == user_id) if user_id else None
+            )
+            skipped_ids = {row["id"] for row in portfolio_rows} - written_ids
+            if skipped_ids and user_id:
+                # Unchanged rows are skipped too; only rows owned by someone else
+                # mean the save did not happen, so fail instead of reporting success
+                foreign_ids = [
+                    portfolio_id for (portfolio_id,) in db.query(PortfolioModel.id).filter(
+                        PortfolioModel.id.in_(skipped_ids),
+                        PortfolioModel.user_id.is_distinct_from(user_id)
+                    )
+                ]
+                if foreign_ids:
+                    raise HTTPException(
+                        status_code=409,
+                        detail=f"Portfolio ids already in use by another account: {', '.join(sorted(foreign_ids))}"
+                    )
         
         # Save family members
         if data.familyMembers:
@@ -183,8 +172,8 @@ async def save_data(
             query = db.query(FamilyMemberModel)
             if user_id:
                 query = query.filter(FamilyMemberModel.user_id == user_id)
-            existing_members = query.all()
-            existing_member_ids = {m.id for m in existing_members}
+            existing_members = {m.id: m for m in query.all()}
+            existing_member_ids = set(existing_members)
             incoming_member_ids = {m.id for m in data.familyMembers}
             
             # Delete members that are no longer in the incoming data
@@ -197,12 +186,11 @@ async def save_data(
                     delete_query = delete_query.filter(FamilyMemberModel.user_id == user_id)
                 delete_query.delete(synchronize_session=False)
             
-            # Create or update family members
+            # Create or update family members, reusing the rows loaded above
+            # instead of querying each member again
+            new_member_rows = []
             for member_data in data.familyMembers:
-                query = db.query(FamilyMemberModel).filter(FamilyMemberModel.id == member_data.id)
-                if user_id:
-                    query = query.filter(FamilyMemberModel.user_id == user_id)
-                member = query.first()
+                member = existing_members.get(member_data.id)
                 
                 # Pydantic models use attribute access - use displayOrder (camelCase) as defined in schema
                 # With populate_by_name=True, we can access as displayOrder
@@ -217,20 +205,69 @@ async def save_data(
                     member.name = member_data.name
                     member.amount = member_data.amount
                     member.display_order = display_order
-                    member.updated_at = datetime.now(timezone.utc)
                 else:
                     # Create new
-                    member = FamilyMemberModel(
-                        id=member_data.id,
-                        user_id=user_id,
-                        name=member_data.name,
-                        amount=member_data.amount,
-                        display_order=display_order
-                    )
-                    db.add(member)
+                    new_member_rows.append({
+                        "id": member_data.id,
+                        "user_id": user_id,
+                        "name": member_data.name,
+                        "amount": member_data.amount,
+                        "display_order": display_order,
+                    })
+            
+            # Bulk INSERT (batched by insertmanyvalues) without building ORM objects
+            if new_member_rows:
+                db.execute(insert(FamilyMemberModel), new_member_rows)
+        
+        # Save scenarios last: they are shared by all users, so this step runs under a
+        # global lock that is held until commit
+        if data.scenarios:
+            scenario_rows = []
+            for scenario_data in data.scenarios:
+                # Convert camelCase to snake_case for database
+                asset_returns = scenario_data.assetReturns
+                trim_rules = scenario_data.trimRules
+                fidelis_cap = scenario_data.fidelisCap
+                growth_cushion = getattr(scenario_data, 'growthCushion', None) or getattr(scenario_data, 'growth_cushion', None) or 0.02
+                romanian_inflation = getattr(scenario_data, 'romanianInflation', None) or getattr(scenario_data, 'romanian_inflation', None) or 0.08
+                tax_on_sale_proceeds = getattr(scenario_data, 'taxOnSaleProceeds', None) or getattr(scenario_data, 'tax_on_sale_proceeds', None)
+                tax_on_dividends = getattr(scenario_data, 'taxOnDividends', None) or getattr(scenario_data, 'tax_on_dividends', None)
+            
+                scenario_rows.append({
+                    # Use name as ID for scenarios
+                    "id": scenario_data.name,
+                    "name": scenario_data.name,
+                    "inflation": scenario_data.inflation,
+                    "romanian_inflation": romanian_inflation,
+                    "growth_cushion": growth_cushion,
+                    "tax_on_sale_proceeds": tax_on_sale_proceeds,
+                    "tax_on_dividends": tax_on_dividends,
+                    "asset_returns": asset_returns,
+                    "trim_rules": trim_rules,
+                    "fidelis_cap": fidelis_cap,
+                    "is_default": (data.default_scenario_id == scenario_data.name),
+                })
+
+            # Write the member changes first so the lock below covers only scenario work
+            db.flush()
+            # Concurrent saves must not interleave the clear-then-set of is_default: the
+            # UPDATE would miss a default committed meanwhile and the upsert would then
+            # violate the unique index
+            db.execute(select(func.pg_advisory_xact_lock(SCENARIO_DEFAULT_LOCK_ID)))
+            # Unset the default on rows that lose it (only rows that are set, via the
+            # partial index). A default that stays the same is left alone, so a repeated
+            # save does not rewrite it here only for the upsert to flip it back.
+            db.query(ScenarioModel).filter(
+                ScenarioModel.is_default == True,
+                ScenarioModel.id != data.default_scenario_id
+            ).update({ScenarioModel.is_default: False})
+            _upsert(db, ScenarioModel, scenario_rows)
         
         db.commit()
         return {"status": "success", "message": "Data saved successfully"}
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         import traceback
@@ -240,7 +277,7 @@ async def save_data(
 
 
 @app.get("/api/data/load", response_model=LoadDataResponse)
-async def load_data(
+def load_data(
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_user_optional)
 ):
@@ -263,9 +300,8 @@ async def load_data(
             query = query.filter(FamilyMemberModel.user_id == user_id)
         family_members = query.all()
         
-        default_scenario = db.query(ScenarioModel).filter(
-            ScenarioModel.is_default == True
-        ).first()
+        # Pick the default from the scenarios already loaded instead of querying again
+        default_scenario = next((s for s in scenarios if s.is_default), None)
         
         # Convert family members to response format
         family_member_responses = []
@@ -322,7 +358,7 @@ async def load_data(
 
 
 @app.delete("/api/data/clear")
-async def clear_data(db: Session = Depends(get_db)):
+def clear_data(db: Session = Depends(get_db)):
     """Clear all data (for testing/reset)."""
     try:
         db.query(PortfolioModel).delete()
@@ -2,17 +2,37 @@
 Database models for portfolios and scenarios.
 """
 
-from sqlalchemy import Column, Integer, String, Float, Boolean, JSON, DateTime, func, ForeignKey, Index
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, func, ForeignKey, Index, CheckConstraint, DDL, event, text
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+import os
+import time
 import uuid
 from app.database import Base
 
 
-class UserModel(Base):
+def uuid7() -> uuid.UUID:
+    """Time-ordered UUID (RFC 9562 version 7): 48-bit millisecond timestamp + random bits.
+
+    New keys land at the right edge of the primary key BTREE instead of a random page.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return uuid.UUID(int=value)
+
+
+class TimestampMixin:
+    """created_at/updated_at maintained by the database clock."""
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class UserModel(TimestampMixin, Base):
     __tablename__ = "users"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     email = Column(String(255), unique=True, nullable=False, index=True)
     email_verified = Column(Boolean, default=False, nullable=False)
     password_hash = Column(String(255), nullable=False)
@@ -31,36 +51,58 @@ class UserModel(Base):
     parent_user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=True)
     is_primary_account = Column(Boolean, default=True, nullable=False)
     
-    # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    # Timestamps (created_at/updated_at from TimestampMixin)
     last_login_at = Column(DateTime(timezone=True), nullable=True)
     
     # Relationships
-    sessions = relationship("UserSessionModel", back_populates="user", cascade="all, delete-orphan")
-    portfolios = relationship("PortfolioModel", back_populates="user", cascade="all, delete-orphan")
-    family_members = relationship("FamilyMemberModel", back_populates="user", foreign_keys="FamilyMemberModel.user_id", cascade="all, delete-orphan")
+    # passive_deletes: the FKs are ON DELETE CASCADE, so deleting a user lets the
+    # database remove children instead of loading and deleting them row by row
+    sessions = relationship("UserSessionModel", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    portfolios = relationship("PortfolioModel", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    family_members = relationship("FamilyMemberModel", back_populates="user", foreign_keys="FamilyMemberModel.user_id", cascade="all, delete-orphan", passive_deletes=True)
+
+    # Fetch server defaults (created_at/updated_at) with INSERT ... RETURNING
+    __mapper_args__ = {"eager_defaults": True}
+
+    __table_args__ = (
+        # Plain string + CHECK rather than a native ENUM: adding a role is an ALTER TABLE,
+        # not ALTER TYPE ... ADD VALUE
+        CheckConstraint("role IN ('freemium', 'paid', 'admin')", name="ck_users_role"),
+    )
 
 
 class UserSessionModel(Base):
     __tablename__ = "user_sessions"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    # Sessions are inserted on every login; time-ordered ids keep the PK index append-only
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
-    refresh_token_hash = Column(String(255), nullable=False, index=True)
-    device_info = Column(JSON, nullable=True)
+    refresh_token_hash = Column(String(255), nullable=False)
+    device_info = Column(JSONB, nullable=True)
     ip_address = Column(String(45), nullable=True)  # IPv6 max length
-    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     # Relationships
     user = relationship("UserModel", back_populates="sessions")
 
+    __table_args__ = (
+        # The refresh check matches hash, user_id and expires_at; carrying the other two
+        # in the index makes it an index-only scan with no heap fetch
+        Index("ix_user_sessions_refresh_token_hash", "refresh_token_hash", postgresql_include=["user_id", "expires_at"]),
+        # Sessions churn (a row per login, deleted on logout) on a small table, so
+        # vacuum/analyze at 2%/1% dead rows instead of 20%/10%
+        {"info": {"storage_parameters": {
+            "autovacuum_vacuum_scale_factor": "0.02",
+            "autovacuum_analyze_scale_factor": "0.01",
+        }}},
+    )
+
 
 class UserInvitationModel(Base):
     __tablename__ = "user_invitations"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     inviter_user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     invitee_email = Column(String(255), nullable=False, index=True)
     family_member_id = Column(String(100), nullable=True)  # Links to FamilyMember.id
@@ -76,10 +118,10 @@ class UserInvitationModel(Base):
     inviter = relationship("UserModel", foreign_keys=[inviter_user_id])
 
 
-class PortfolioModel(Base):
+class PortfolioModel(TimestampMixin, Base):
     __tablename__ = "portfolios"
 
-    id = Column(String, primary_key=True, index=True)
+    id = Column(String, primary_key=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=True, index=True)  # Nullable for migration
     name = Column(String, nullable=False)
     color = Column(String, nullable=False)
@@ -88,50 +130,85 @@ class PortfolioModel(Base):
     risk_label = Column(String, nullable=True)  # e.g., "Risk: Medium"
     horizon = Column(String, nullable=True)  # e.g., "2026 - 2029"
     selected_strategy = Column(String, nullable=True)  # For custom portfolios: "Aggressive Growth", "Balanced Allocation", or "Income Focused"
-    overperform_strategy = Column(JSON, nullable=True)  # {title, content: []}
-    allocation = Column(JSON, nullable=False)  # {vwce, tvbetetf, ernx, ayeg, fidelis}
+    overperform_strategy = Column(JSONB, nullable=True)  # {title, content: []}
+    allocation = Column(JSONB, nullable=False)  # {vwce, tvbetetf, ernx, ayeg, fidelis}
     # member_allocations removed - we now use per-member portfolios instead
-    rules = Column(JSON, nullable=False)  # {tvbetetfConditional}
-    strategy = Column(JSON, nullable=True)  # {overperformanceStrategy, overperformanceThreshold}
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    rules = Column(JSONB, nullable=False)  # {tvbetetfConditional}
+    strategy = Column(JSONB, nullable=True)  # {overperformanceStrategy, overperformanceThreshold}
     
     # Relationships
     user = relationship("UserModel", back_populates="portfolios")
 
+    __table_args__ = (
+        CheckConstraint("jsonb_typeof(allocation) = 'object'", name="ck_portfolios_allocation_object"),
+        CheckConstraint("jsonb_typeof(rules) = 'object'", name="ck_portfolios_rules_object"),
+        # Every save rewrites the user's portfolios without touching an indexed column;
+        # leaving 10% of each page free lets those updates stay HOT (no index writes,
+        # no page hop)
+        {"info": {"storage_parameters": {"fillfactor": "90"}}},
+    )
+
 
-class ScenarioModel(Base):
+class ScenarioModel(TimestampMixin, Base):
     __tablename__ = "scenarios"
 
-    id = Column(String, primary_key=True, index=True)
+    id = Column(String, primary_key=True)
     name = Column(String, nullable=False, unique=True, index=True)
     inflation = Column(Float, nullable=False)  # International inflation
     romanian_inflation = Column(Float, nullable=True, default=0.08)  # Romanian inflation (default 8%)
     growth_cushion = Column(Float, nullable=True, default=0.02)  # Real growth cushion (e.g., 0.02 = 2%)
     tax_on_sale_proceeds = Column(Float, nullable=True)  # Tax rate on capital gains (e.g., 0.10 = 10%)
     tax_on_dividends = Column(Float, nullable=True)  # Tax rate on dividends/yield (e.g., 0.05 = 5%)
-    asset_returns = Column(JSON, nullable=False)  # {vwce, tvbetetf, ernx, ernxYield, ayeg, ayegYield, fidelis}
-    trim_rules = Column(JSON, nullable=False)  # {vwce: {enabled, threshold}, ...}
+    asset_returns = Column(JSONB, nullable=False)  # {vwce, tvbetetf, ernx, ernxYield, ayeg, ayegYield, fidelis}
+    trim_rules = Column(JSONB, nullable=False)  # {vwce: {enabled, threshold}, ...}
     fidelis_cap = Column(Float, nullable=False)
     is_default = Column(Boolean, default=False, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    __table_args__ = (
+        # Only the default scenario is indexed; save_data looks it up to unset the flag,
+        # and uniqueness lets the database guarantee there is at most one default
+        Index("ix_scenarios_default", "is_default", unique=True, postgresql_where=text("is_default")),
+        CheckConstraint("jsonb_typeof(asset_returns) = 'object'", name="ck_scenarios_asset_returns_object"),
+        CheckConstraint("jsonb_typeof(trim_rules) = 'object'", name="ck_scenarios_trim_rules_object"),
+    )
 
 
-class FamilyMemberModel(Base):
+class FamilyMemberModel(TimestampMixin, Base):
     __tablename__ = "family_members"
 
-    id = Column(String, primary_key=True, index=True)  # UUID
-    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=True, index=True)  # Nullable for migration
+    id = Column(String, primary_key=True)  # UUID
+    # Indexed as the leading column of ix_family_members_user_order
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=True)  # Nullable for migration
     linked_user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='SET NULL'), nullable=True)  # If invited & accepted
     email = Column(String(255), nullable=True)
     color = Column(String(20), nullable=True)
     name = Column(String, nullable=False)
     amount = Column(Float, nullable=False)
     display_order = Column(Integer, nullable=False, default=0)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     
     # Relationships
     user = relationship("UserModel", back_populates="family_members", foreign_keys=[user_id], remote_side="UserModel.id")
 
+    __table_args__ = (
+        # Serves load_data's "members of a user in display order" query without a sort
+        Index("ix_family_members_user_order", "user_id", "display_order", "created_at"),
+    )
+
+
+def storage_parameters_clause(table) -> str:
+    """The "(name = value, ...)" list of a table's storage parameters, or "" if none."""
+    params = table.info.get("storage_parameters")
+    if not params:
+        return ""
+    return "(" + ", ".join(f"{name} = {value}" for name, value in params.items()) + ")"
+
+
+# SQLAlchemy has no table-level WITH (...) option for Postgres, so storage parameters
+# are applied right after CREATE TABLE (and by schema_upgrade on existing databases)
+for _table in Base.metadata.tables.values():
+    if _table.info.get("storage_parameters"):
+        event.listen(
+            _table,
+            "after_create",
+            DDL(f"ALTER TABLE %(table)s SET {storage_parameters_clause(_table)}").execute_if(dialect="postgresql")
+        )
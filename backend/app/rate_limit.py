@@ -0,0 +1,84 @@
+"""
+Per-user concurrency limiting for expensive endpoints.
+"""
+
+from fastapi import Depends, HTTPException, Request, status
+from typing import Dict, Optional
+import os
+import threading
+
+from app.auth import get_current_user_optional
+from app.models import UserModel
+
+# Maximum in-flight saves per user (or per client address when anonymous); the default
+# of 1 serializes a user's saves so overlapping ones cannot race each other
+SAVE_CONCURRENCY_LIMIT = int(os.getenv("SAVE_CONCURRENCY_LIMIT", "1"))
+
+
+class ConcurrencyLimiter:
+    """Caps the number of in-flight requests per key within this process.
+
+    Unlike a rate limit this does not cap throughput: a slot is freed as soon
+    as the request finishes, so only overlapping requests are rejected.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, int] = {}
+
+    def acquire(self, key: str) -> bool:
+        """Take a slot for key; returns False if the key is already at the limit."""
+        with self._lock:
+            count = self._in_flight.get(key, 0)
+            if count >= self.limit:
+                return False
+            self._in_flight[key] = count + 1
+            return True
+
+    def release(self, key: str) -> None:
+        """Give back a slot taken by acquire()."""
+        with self._lock:
+            count = self._in_flight.get(key, 0) - 1
+            if count > 0:
+                self._in_flight[key] = count
+            else:
+                self._in_flight.pop(key, None)
+
+
+save_limiter = ConcurrencyLimiter(SAVE_CONCURRENCY_LIMIT)
+
+
+def _client_address(request: Request) -> str:
+    """Address of the calling client, looking through the nginx proxy when present."""
+    # Behind nginx request.client is the proxy itself, which would put every
+    # anonymous caller in one bucket; nginx passes the real address in X-Real-IP
+    real_ip = request.headers.get("x-real-ip")
+    if real_ip:
+        return real_ip
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if forwarded_for:
+        return forwarded_for.split(",")[0].strip()
+    return request.client.host if request.client else "anonymous"
+
+
+def limit_concurrent_saves(
+    request: Request,
+    current_user: Optional[UserModel] = Depends(get_current_user_optional)
+):
+    """Dependency that rejects a save while too many are running for the same user."""
+    if current_user:
+        key = str(current_user.id)
+    else:
+        key = _client_address(request)
+
+    if not save_limiter.acquire(key):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many concurrent save requests",
+            headers={"Retry-After": "1"}
+        )
+    try:
+        yield
+    finally:
+        save_limiter.release(key)
@@ -0,0 +1,123 @@
+"""
+Idempotent upgrade of databases created before the current models.
+
+create_all() only creates missing tables; it never alters existing ones. This brings
+an existing schema in line with models.py: json columns become jsonb, missing CHECK
+constraints and indexes are added, indexes whose definition changed are rebuilt,
+obsolete indexes are dropped and table storage parameters are set. Every step checks
+the live schema first, so running it on an up-to-date database is a no-op.
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import AddConstraint, CheckConstraint
+
+from app.database import Base
+from app.models import storage_parameters_clause
+
+# Indexes that earlier versions created and the models no longer define: the
+# redundant single-column indexes on primary keys, ones superseded by a composite
+# or covering index, and the BRIN indexes on expiry columns
+OBSOLETE_INDEXES = (
+    ("users", "ix_users_id"),
+    ("user_sessions", "ix_user_sessions_id"),
+    ("user_sessions", "ix_user_sessions_expires_at"),
+    ("user_sessions", "ix_user_sessions_expires_brin"),
+    ("user_invitations", "ix_user_invitations_id"),
+    ("user_invitations", "ix_user_invitations_expires_brin"),
+    ("portfolios", "ix_portfolios_id"),
+    ("scenarios", "ix_scenarios_id"),
+    ("family_members", "ix_family_members_id"),
+    ("family_members", "ix_family_members_user_id"),
+)
+
+# CHECK constraints that earlier versions created and the models no longer define
+OBSOLETE_CONSTRAINTS = (
+    ("user_invitations", "ck_user_invitations_status"),
+)
+
+
+def upgrade_schema(connection: Connection) -> None:
+    """Apply the pending schema changes on an existing database (Postgres only)."""
+    if connection.dialect.name != "postgresql":
+        return
+    inspector = inspect(connection)
+    tables = [table for table in Base.metadata.sorted_tables if inspector.has_table(table.name)]
+
+    for table in tables:
+        _convert_json_columns(connection, inspector, table)
+    for table in tables:
+        _add_check_constraints(connection, inspector, table)
+    for table_name, name in OBSOLETE_CONSTRAINTS:
+        if inspector.has_table(table_name) and name in {
+            constraint["name"] for constraint in inspector.get_check_constraints(table_name)
+        }:
+            connection.execute(text(f"ALTER TABLE {table_name} DROP CONSTRAINT {name}"))
+
+    for table_name, name in OBSOLETE_INDEXES:
+        if inspector.has_table(table_name) and name in {
+            index["name"] for index in inspector.get_indexes(table_name)
+        }:
+            connection.execute(text(f"DROP INDEX {name}"))
+    for table in tables:
+        _sync_indexes(connection, inspector, table)
+        _set_storage_parameters(connection, table)
+
+
+def _convert_json_columns(connection: Connection, inspector, table) -> None:
+    """Retype json columns that the models declare as JSONB."""
+    live_types = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+    for column in table.columns:
+        live_type = live_types.get(column.name)
+        if isinstance(column.type, JSONB) and live_type is not None and not isinstance(live_type, JSONB):
+            connection.execute(text(
+                f"ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE jsonb USING {column.name}::jsonb"
+            ))
+
+
+def _add_check_constraints(connection: Connection, inspector, table) -> None:
+    """Add named CHECK constraints that exist in the models but not in the database."""
+    live_names = {constraint["name"] for constraint in inspector.get_check_constraints(table.name)}
+    for constraint in table.constraints:
+        if isinstance(constraint, CheckConstraint) and constraint.name and constraint.name not in live_names:
+            connection.execute(AddConstraint(constraint))
+
+
+def _sync_indexes(connection: Connection, inspector, table) -> None:
+    """Create missing indexes and rebuild those whose columns, uniqueness or INCLUDE list changed."""
+    live_indexes = {index["name"]: index for index in inspector.get_indexes(table.name)}
+    for index in table.indexes:
+        live = live_indexes.get(index.name)
+        if live is not None:
+            wanted_include = list(index.dialect_options["postgresql"]["include"] or [])
+            live_include = list(live.get("dialect_options", {}).get("postgresql_include") or [])
+            if (
+                live["column_names"] == [column.name for column in index.columns]
+                and bool(live["unique"]) == bool(index.unique)
+                and live_include == wanted_include
+            ):
+                continue
+            connection.execute(text(f"DROP INDEX {index.name}"))
+        if index.name == "ix_scenarios_default":
+            # The unique partial index allows one default; keep the most recently
+            # updated one if older code left several
+            connection.execute(text(
+                "UPDATE scenarios SET is_default = false WHERE is_default AND id <> ("
+                "SELECT id FROM scenarios WHERE is_default ORDER BY updated_at DESC, id LIMIT 1)"
+            ))
+        index.create(connection)
+
+
+def _set_storage_parameters(connection: Connection, table) -> None:
+    """Set the table's storage parameters unless they are already in place."""
+    params = table.info.get("storage_parameters")
+    if not params:
+        return
+    reloptions = connection.execute(
+        text("SELECT reloptions FROM pg_class WHERE oid = CAST(:name AS regclass)"),
+        {"name": table.name}
+    ).scalar() or []
+    if set(reloptions) >= {f"{name}={value}" for name, value in params.items()}:
+        return
+    connection.execute(text(f"ALTER TABLE {table.name} SET {storage_parameters_clause(table)}"))
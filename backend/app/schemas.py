@@ -135,3 +135,22 @@ class UserResponse(BaseModel):
     
     model_config = ConfigDict(from_attributes=True)
 
+    @classmethod
+    def from_user(cls, user: Any) -> "UserResponse":
+        """Build a response from a UserModel (or a row with the same columns).
+        
+        Every field comes straight from the database, so skip input validation.
+        """
+        return cls.model_construct(
+            id=str(user.id),
+            email=user.email,
+            email_verified=user.email_verified,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            role=user.role,
+            subscription_tier=user.subscription_tier,
+            subscription_expires_at=user.subscription_expires_at,
+            is_primary_account=user.is_primary_account,
+            created_at=user.created_at
+        )
+
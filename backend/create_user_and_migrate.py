@@ -10,14 +10,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app.database import SessionLocal, init_db
 from app.models import UserModel, PortfolioModel, FamilyMemberModel
-from passlib.context import CryptContext
-
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def get_password_hash(password: str) -> str:
-    """Hash a password."""
-    return pwd_context.hash(password)
+from app.auth import get_password_hash
 
 def create_user_and_migrate():
     """Create a user and migrate existing portfolios and family members to that user."""
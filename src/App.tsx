@@ -4,7 +4,7 @@ import { Portfolio, Scenario, ChartType, FamilyMember, YearResult } from './type
 import { scenarios, defaultScenario } from './data/scenarios';
 import { portfolioTemplates, portfolioColors } from './data/templates';
 import { useSimulation } from './hooks/useSimulation';
-import { saveData, loadData } from './services/api';
+import { saveData, loadData, SaveSupersededError } from './services/api';
 import { useAuth } from './contexts/AuthContext';
 import Header from './components/Header';
 import ScenarioSelector from './components/ScenarioSelector';
@@ -352,7 +352,10 @@ function PortfolioApp() {
         default_scenario_id: activeScenario.name
       });
     } catch (error) {
-      console.error('Error saving data:', error);
+      // A superseded autosave is expected: the newer autosave carries the same state
+      if (!(error instanceof SaveSupersededError)) {
+        console.error('Error saving data:', error);
+      }
     }
   }, [portfolios, selectedScenario, customScenario, scenariosState, isLoading, totalInvestment, familyMembers]);
 
@@ -83,12 +83,45 @@ export interface LoadDataResponse {
   default_scenario_id?: string;
 }
 
+// The backend answers 429 while too many saves are in flight for the same user
+const MAX_SAVE_ATTEMPTS = 5;
+let latestSaveGeneration = 0;
+
+/**
+ * Thrown when a save waiting to be retried is dropped because a newer save was started.
+ * The data in the dropped save was not written.
+ */
+export class SaveSupersededError extends Error {
+  constructor() {
+    super('Save superseded by a newer save before it could be written');
+    this.name = 'SaveSupersededError';
+    // Keep instanceof working when compiled down to ES5
+    Object.setPrototypeOf(this, SaveSupersededError.prototype);
+  }
+}
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
 export async function saveData(data: SaveDataRequest): Promise<void> {
-  try {
-    await api.post('/api/data/save', data);
-  } catch (error) {
-    console.error('Error saving data:', error);
-    throw error;
+  const generation = ++latestSaveGeneration;
+  for (let attempt = 1; ; attempt++) {
+    try {
+      await api.post('/api/data/save', data);
+      return;
+    } catch (error: any) {
+      if (error.response?.status === 429 && attempt < MAX_SAVE_ATTEMPTS) {
+        // Wait for the in-flight saves to finish, then try again
+        const retryAfterSeconds = Number(error.response.headers?.['retry-after']) || 1;
+        await sleep(retryAfterSeconds * 1000 * attempt);
+        // A newer save carries newer state; retrying this one could overwrite it
+        if (generation !== latestSaveGeneration) {
+          throw new SaveSupersededError();
+        }
+        continue;
+      }
+      console.error('Error saving data:', error);
+      throw error;
+    }
   }
 }
 